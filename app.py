@@ -1,59 +1,169 @@
-from flask import Flask, request, jsonify, redirect
+from flask import Flask, Response, abort, request, jsonify, redirect
 import requests
+import schedule
 import secrets
 import hashlib
+import heapq
+import hmac
 import base64
 import urllib.parse
 import webbrowser
 import time
-import warnings
-import json
+import logging
 import os
+import queue
+import threading
+import urllib3
+import orjson
+import pytz
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from urllib3.exceptions import InsecureRequestWarning
+from flask.json.provider import JSONProvider
+from functools import lru_cache
+from urllib3.util.retry import Retry
 
-# Suppress SSL warnings for development
-warnings.filterwarnings('ignore', category=InsecureRequestWarning)
+from buffered_logging import setup_logging
+from http_adapter import LowLatencyAdapter, socket_options
+
+# All logs go through logging so the noisy request/response dumps can be switched on
+# with LOG_LEVEL=DEBUG without paying for them otherwise. Records are buffered and
+# written out in batches, see buffered_logging.
+logger, LOG_HANDLER = setup_logging('booking-bot')
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, which is much faster for the big raw_* payloads"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            mimetype='application/json'
+        )
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+# Browsers may reuse static files (the dashboard) for 5 min before revalidating
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 300
 
 # Use Railway's persistent volume or fallback to current directory
 DATA_DIR = os.environ.get('RAILWAY_VOLUME_MOUNT_PATH', '/data')
 if not os.path.exists(DATA_DIR):
     try:
         os.makedirs(DATA_DIR)
-        print(f"Created data directory at: {DATA_DIR}")
+        logger.info("Created data directory at: %s", DATA_DIR)
     except Exception as e:
-        print(f"Failed to create data directory: {e}")
+        logger.error("Failed to create data directory: %s", e)
         DATA_DIR = '.'
 TOKENS_FILE = os.path.join(DATA_DIR, 'soho_tokens.json')
 LAST_BOOKING_FILE = os.path.join(DATA_DIR, 'last_booking.json')
 
 # Logs for debugging in prod
-print(f"DATA_DIR: {DATA_DIR}")
-print(f"TOKENS_FILE: {TOKENS_FILE}")
-print(f"LAST_BOOKING_FILE: {LAST_BOOKING_FILE}")
-print(f"DATA_DIR exists: {os.path.exists(DATA_DIR)}")
-print(f"DATA_DIR is writable: {os.access(DATA_DIR, os.W_OK)}")
+logger.info("DATA_DIR: %s", DATA_DIR)
+logger.info("TOKENS_FILE: %s", TOKENS_FILE)
+logger.info("LAST_BOOKING_FILE: %s", LAST_BOOKING_FILE)
+logger.info("DATA_DIR exists: %s", os.path.exists(DATA_DIR))
+logger.info("DATA_DIR is writable: %s", os.access(DATA_DIR, os.W_OK))
+LOG_HANDLER.flush()
 
 
 # OAuth configuration
 CLIENT_ID = "e7f9c1e1584911fcdd1d9ceb9f1ffac8e175e1ba639e5bcbc58ca76b9ea084f2"
 REDIRECT_URI = "com.sohohouse.houseseven://authcallback"
 IDENTITY_BASE_URL = "https://identity.sohohouse.com"
+TOKEN_REFRESH_BUFFER = 300  # refresh the access token when it has less than 5 min left
+SOHO_API_BASE_URL = "https://api.production.sohohousedigital.com"
+USER_AGENT = 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)'
+
+# Shared HTTP session so calls to the Soho hosts reuse keep-alive TLS connections
+# instead of doing a fresh TCP + TLS handshake every time (matters for lock -> book).
+# Status retries only apply to idempotent methods, so booking POSTs are never replayed.
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': USER_AGENT})
+_adapter = LowLatencyAdapter(
+    # Keepalive probes keep the connections opened by /prewarm alive until the booking
+    socket_options(keepidle=60),
+    pool_connections=8,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+)
+SESSION.mount('https://', _adapter)
+# (connect, read) timeout for every outbound call so a hung upstream can't pin a worker
+_TIMEOUT = (3.05, 10)
+# The booking POST gets longer to answer: giving up early doesn't cancel a booking Soho is
+# still processing, it only leaves us not knowing whether it went through
+_BOOKING_TIMEOUT = (3.05, 30)
+
+# Static request headers, built once. Only the per-call Authorization header is added
+# on top (requests merges these into a fresh dict, so the constants are never mutated).
+_IDENTITY_HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': '*/*'
+}
+_JSON_HEADERS = {
+    'Accept': 'application/json',
+    'Content-Type': 'application/json'
+}
+_ACCEPT_HEADERS = {
+    'Accept': 'application/json'
+}
+_ACCOUNT_HEADERS = {
+    'Accept': '*/*',
+    'Content-Type': 'application/vnd.api+json',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'User-Time-Zone': 'America/New_York',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Cache-Control': 'no-cache'
+}
+
+@lru_cache(maxsize=8)
+def _bearer_json_headers(access_token):
+    """_JSON_HEADERS plus the Authorization header, built once per token"""
+    return {**_JSON_HEADERS, 'Authorization': f'Bearer {access_token}'}
+
+# Format for the 'time' field of the last booking status
+_STATUS_TIME_FMT = '%Y-%m-%d %I:%M %p'
+# The venues (and the 12:00 slot release) are in New York, whatever timezone the host runs
+# in (UTC on Railway). pytz rather than zoneinfo: schedule's .at() only takes pytz zones,
+# and it keeps Python 3.8 working.
+BOOKING_TZ_NAME = 'America/New_York'
+BOOKING_TZ = pytz.timezone(BOOKING_TZ_NAME)
+
+# Thread pool for fanning out network-bound calls (e.g. availability probes) over SESSION
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
 
 
 # Store PKCE parameters temporarily
 oauth_sessions = {}
+OAUTH_SESSION_TTL = 600  # 10 min timeout
+# Min-heap of (expires_at, session_id) so cleanup only touches expired sessions
+_session_heap = []
+_last_cleanup = [0.0]
+
+def _json_body(silent=False):
+    """Parse the request body with orjson, without Flask caching a copy (empty body -> {})"""
+    try:
+        data = orjson.loads(request.get_data(cache=False) or b'{}')
+    except orjson.JSONDecodeError:
+        if silent:
+            return {}
+        abort(400, description="Request body must be valid JSON")
+    return data if isinstance(data, dict) else {}
 
 def generate_code_verifier():
     """Generate a code verifier for PKCE"""
-    return base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
+    return secrets.token_urlsafe(32)
 
 def generate_code_challenge(verifier):
     """Generate code challenge from verifier"""
     digest = hashlib.sha256(verifier.encode('utf-8')).digest()
-    return base64.urlsafe_b64encode(digest).decode('utf-8').rstrip('=')
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
 
 @app.route("/start-auth", methods=['GET'])
 def start_auth():
@@ -72,6 +182,7 @@ def start_auth():
         'state': state,
         'created_at': time.time()
     }
+    heapq.heappush(_session_heap, (time.time() + OAUTH_SESSION_TTL, session_id))
     
     auth_params = {
         'client_id': CLIENT_ID,
@@ -104,7 +215,7 @@ def start_auth():
 def complete_auth():
     """Complete the OAuth flow with the redirect URL from manual login"""
     
-    data = request.json
+    data = _json_body()
     session_id = data.get('session_id')
     redirect_url = data.get('redirect_url')
     
@@ -112,23 +223,21 @@ def complete_auth():
         return jsonify({"error": "Missing session_id or redirect_url"}), 400
     
     session_data = oauth_sessions.get(session_id)
-    if not session_data:
+    if not session_data or time.time() - session_data['created_at'] > OAUTH_SESSION_TTL:
         return jsonify({"error": "Invalid or expired session"}), 400
     
     try:
-        parsed_url = urllib.parse.urlparse(redirect_url)
-        params = urllib.parse.parse_qs(parsed_url.query)
-        auth_code = params.get('code', [None])[0]
-        state = params.get('state', [None])[0]
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(redirect_url).query))
+        auth_code = params.get('code')
+        state = params.get('state')
         
         if not auth_code:
             return jsonify({"error": "No authorization code in redirect URL"}), 400
         
-        print(f"Expected state: {session_data['state']}")
-        print(f"Received state: {state}")
+        logger.debug("Expected state: %s / received state: %s", session_data['state'], state)
         
         # Verify state matches
-        if state != session_data['state']:
+        if not state or not hmac.compare_digest(state, session_data['state']):
             return jsonify({
                 "error": "State mismatch - possible CSRF attack",
                 "debug": {
@@ -150,26 +259,21 @@ def complete_auth():
         "code_verifier": session_data['code_verifier']
     }
     
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': '*/*',
-        'User-Agent': 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)'
-    }
+    headers = _IDENTITY_HEADERS
     
-    print(f"Exchanging code for token...")
-    print(f"Code: {auth_code[:20]}...")
+    logger.info("Exchanging code for token (code: %s...)", auth_code[:20])
     
-    response = requests.post(
+    response = SESSION.post(
         f"{IDENTITY_BASE_URL}/oauth/token",
         json=token_data,
         headers=headers,
-        verify=False  
+        timeout=_TIMEOUT
     )
     
     del oauth_sessions[session_id]
     
     if response.status_code == 200:
-        token_response = response.json()
+        token_response = orjson.loads(response.content)
         
         # Save tokens automatically
         token_save_data = {
@@ -201,124 +305,117 @@ def complete_auth():
         }), 500
 
 
-@app.route("/book-poolside/<token>", methods=['POST'])
-def book_poolside(token):
-    """Book a poolside table using the authenticated token"""
-    
-    data = request.json
-    venue_id = data.get('venue_id', 'NY_POOLSIDE')  
-    party_size = data.get('party_size', 2)
-    phone_country_code = data.get('phone_country_code', 'US')  
-    phone_number = data.get('phone_number', '7709255248')
-    date_time = data.get('date_time')
-    if not date_time:
-        # Calculate 48 hours from now at 1:30 PM
-        booking_date = datetime.now() + timedelta(days=2)
-        date_time = booking_date.strftime('%Y-%m-%d') + 'T13:30'
-    
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'User-Agent': 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)'
-    }
-    
-    lock_data = {
-        "data": {
-            "type": "table_locks",
-            "attributes": {
-                "party_size": party_size,
-                "extra_attribute": "default",
-                "date_time": date_time
-            },
-            "relationships": {
-                "restaurant": {
-                    "data": {
-                        "type": "restaurants",
-                        "id": venue_id
-                    }
-                }
-            }
-        }
-    }
+# Lock -> book helpers shared by the booking endpoints. Both go through SESSION, so the
+# booking POST reuses the keep-alive connection the lock POST just opened.
+# Lock/booking request bodies as byte templates, so the hot path only JSON-encodes the
+# variable fields (with orjson, for correct escaping) instead of building and serializing
+# nested dicts. Sent with data= and the Content-Type from _JSON_HEADERS.
+_LOCK_TMPL = (
+    b'{"data":{"type":"table_locks",'
+    b'"attributes":{"party_size":%s,"extra_attribute":"default","date_time":%s},'
+    b'"relationships":{"restaurant":{"data":{"type":"restaurants","id":%s}}}}}'
+)
+_BOOKING_TMPL = (
+    b'{"data":{"type":"table_bookings",'
+    b'"attributes":{"date_time":%s,"party_size":%s,"phone":{"country_code":%s,"number":%s},'
+    b'"guest_notes":"","terms_consent":true,"guest_consent":true},'
+    b'"relationships":{"restaurant":{"data":{"type":"restaurants","id":%s}},'
+    b'"table_lock":{"data":{"type":"table_locks","id":%s}}}}}'
+)
+
+def _lock_table(headers, venue_id, date_time, party_size):
+    """Lock a table at a venue, returns the raw lock response"""
+    lock_data = _LOCK_TMPL % (orjson.dumps(party_size), orjson.dumps(date_time), orjson.dumps(venue_id))
     
-    print(f"Locking table at {venue_id} for {date_time}...")
-    print(f"Lock request: {json.dumps(lock_data, indent=2)}")
+    logger.info("Locking table at %s for %s...", venue_id, date_time)
+    logger.debug("Lock request: %s", lock_data)
     
-    lock_response = requests.post(
-        "https://api.production.sohohousedigital.com/tables/locks?include=venue,restaurant",
-        json=lock_data,
+    lock_response = SESSION.post(
+        f"{SOHO_API_BASE_URL}/tables/locks?include=venue,restaurant",
+        data=lock_data,
         headers=headers,
-        verify=False
+        timeout=_TIMEOUT
     )
     
-    print(f"Lock response status: {lock_response.status_code}")
-    print(f"Lock response: {lock_response.text[:500]}")
+    # Only decode the body when it's actually going to be logged
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Lock response %s: %s", lock_response.status_code, lock_response.text[:500])
     
-    if lock_response.status_code not in [200, 201]:
-        return jsonify({
-            "error": "Failed to lock table",
-            "status": lock_response.status_code,
-            "response": lock_response.text
-        }), 500
+    return lock_response
+
+def _create_booking(headers, venue_id, date_time, party_size, lock_id, phone_number, phone_country_code='US'):
+    """Turn a table lock into a booking, returns the raw booking response"""
+    booking_data = _BOOKING_TMPL % (
+        orjson.dumps(date_time),
+        orjson.dumps(party_size),
+        orjson.dumps(phone_country_code),
+        orjson.dumps(phone_number),
+        orjson.dumps(venue_id),
+        orjson.dumps(lock_id)
+    )
     
-    lock_response_data = lock_response.json()
-    lock_info = lock_response_data.get('data', {})
-    lock_id = lock_info.get('id')
-    lock_token = lock_info.get('attributes', {}).get('token')
+    logger.info("Creating booking...")
+    logger.debug("Booking request: %s", booking_data)
     
-    print(f"Lock successful! Lock ID: {lock_id}")
-    print(f"Lock token: {lock_token[:50]}...")
+    booking_response = SESSION.post(
+        f"{SOHO_API_BASE_URL}/tables/table_bookings?include=venue,restaurant",
+        data=booking_data,
+        headers=headers,
+        timeout=_BOOKING_TIMEOUT
+    )
     
-    booking_data = {
-        "data": {
-            "type": "table_bookings",
-            "attributes": {
-                "date_time": date_time,
-                "party_size": party_size,
-                "phone": {
-                    "country_code": phone_country_code,
-                    "number": phone_number
-                },
-                "guest_notes": "",
-                "terms_consent": True,
-                "guest_consent": True
-            },
-            "relationships": {
-                "restaurant": {
-                    "data": {
-                        "type": "restaurants",
-                        "id": venue_id
-                    }
-                },
-                "table_lock": {
-                    "data": {
-                        "type": "table_locks",
-                        "id": lock_id
-                    }
-                }
-            }
-        }
-    }
+    logger.info("Booking response status: %s", booking_response.status_code)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Booking response: %s", booking_response.text[:500])
     
-    print(f"Creating booking...")
-    print(f"Booking request: {json.dumps(booking_data, indent=2)}")
+    return booking_response
+
+def _request_never_sent(e):
+    """True if a failed request provably never reached Soho (no connection was made)"""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(e, requests.exceptions.ConnectionError) and e.args:
+        # Connect failures come wrapped in MaxRetryError, errors after the request went
+        # out (reset, remote disconnect) come as ProtocolError and are ambiguous
+        reason = e.args[0]
+        return (isinstance(reason, urllib3.exceptions.MaxRetryError)
+                and isinstance(reason.reason, urllib3.exceptions.NewConnectionError))
+    return False
+
+def _complete_booking(headers, lock_info, venue_id, date_time, party_size, phone_number, phone_country_code='US'):
+    """Book a table we already hold a lock for, returns (payload, status)
+
+    Raises RequestException only if the booking request never left. If it failed after
+    being sent (e.g. a read timeout) Soho may have booked it anyway, so the payload has
+    outcome_unknown set and callers must not go on to book another venue.
+    """
+    lock_id = lock_info.get('id')
+    lock_token = lock_info.get('attributes', {}).get('token')
     
-    booking_response = requests.post(
-        "https://api.production.sohohousedigital.com/tables/table_bookings?include=venue,restaurant",
-        json=booking_data,
-        headers=headers,
-        verify=False
-    )
+    logger.info("Lock successful! Lock ID: %s", lock_id)
+    logger.debug("Lock token: %s...", (lock_token or '')[:50])
     
-    print(f"Booking response status: {booking_response.status_code}")
-    print(f"Booking response: {booking_response.text[:500]}")
+    try:
+        booking_response = _create_booking(
+            headers, venue_id, date_time, party_size, lock_id, phone_number, phone_country_code
+        )
+    except requests.exceptions.RequestException as e:
+        if _request_never_sent(e):
+            raise
+        logger.error("Booking request to %s failed after it was sent, outcome unknown: %s", venue_id, e)
+        return {
+            "error": "Booking outcome unknown, check the Soho House app before retrying",
+            "outcome_unknown": True,
+            "venue": venue_id,
+            "date_time": date_time,
+            "details": str(e)
+        }, 504
     
     if booking_response.status_code in [200, 201]:
-        booking_result = booking_response.json()
+        booking_result = orjson.loads(booking_response.content)
         booking_info = booking_result.get('data', {})
         
-        return jsonify({
+        return {
             "success": True,
             "booking_id": booking_info.get('id'),
             "booking_details": {
@@ -329,13 +426,69 @@ def book_poolside(token):
                 "lock_expires_at": lock_info.get('attributes', {}).get('expires_at')
             },
             "raw_response": booking_result
-        })
+        }, 200
     else:
-        return jsonify({
+        return {
             "error": "Failed to create booking",
             "status": booking_response.status_code,
             "response": booking_response.text
-        }), 500
+        }, 500
+
+def _book_poolside_impl(access_token, venue_id, date_time, party_size, phone_number, phone_country_code='US'):
+    """Lock and book a poolside table, returns (payload, status)"""
+    headers = _bearer_json_headers(access_token)
+    
+    lock_response = _lock_table(headers, venue_id, date_time, party_size)
+    
+    if lock_response.status_code not in [200, 201]:
+        return {
+            "error": "Failed to lock table",
+            "status": lock_response.status_code,
+            "response": lock_response.text
+        }, 500
+    
+    lock_info = orjson.loads(lock_response.content).get('data', {})
+    return _complete_booking(
+        headers, lock_info, venue_id, date_time, party_size, phone_number, phone_country_code
+    )
+
+@app.route("/book-poolside/<token>", methods=['POST'])
+def book_poolside(token):
+    """Book a poolside table using the authenticated token"""
+    
+    data = _json_body()
+    venue_id = data.get('venue_id', 'NY_POOLSIDE')  
+    party_size = data.get('party_size', 2)
+    phone_country_code = data.get('phone_country_code', 'US')  
+    phone_number = data.get('phone_number', '7709255248')
+    date_time = data.get('date_time')
+    if not date_time:
+        # Calculate 48 hours from now at 1:30 PM
+        date_time = f"{(datetime.now(BOOKING_TZ).date() + timedelta(days=2)).isoformat()}T13:30"
+    
+    payload, status = _book_poolside_impl(
+        token, venue_id, date_time, party_size, phone_number, phone_country_code
+    )
+    return jsonify(payload), status
+
+def _availability_url(venue_id, date_time, party_size):
+    """Build the availability search URL for a venue"""
+    params = {
+        'filter[restaurant_id]': venue_id,
+        'filter[start_date_time]': date_time,
+        'filter[party_size]': party_size,
+        'filter[search_alternatives]': 'true',
+        'include': 'venue,restaurant'
+    }
+    # Keep brackets, commas and colons literal so the query matches what the app sends
+    return f"{SOHO_API_BASE_URL}/tables/availabilities?" + urllib.parse.urlencode(params, safe='[],:')
+
+def _is_time_slots(available_data):
+    """True if an availability 'data' list holds time slots rather than restaurant alternatives"""
+    if not isinstance(available_data, list) or not available_data or not isinstance(available_data[0], dict):
+        return False
+    first_item = available_data[0]
+    return first_item.get('type') != 'restaurants' and bool((first_item.get('attributes') or {}).get('start_date_time'))
 
 @app.route("/check-poolside-availability/<token>", methods=['GET'])
 def check_poolside_availability(token):
@@ -346,41 +499,27 @@ def check_poolside_availability(token):
     party_size = request.args.get('party_size', 2, type=int)
     
     if not date_time:
-        booking_date = datetime.now() + timedelta(days=2)
-        date_time = booking_date.strftime('%Y-%m-%d') + 'T13:30'
-    party_size = request.args.get('party_size', 2, type=int)
+        date_time = f"{(datetime.now(BOOKING_TZ).date() + timedelta(days=2)).isoformat()}T13:30"
     
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Accept': 'application/json',
-        'User-Agent': 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)'
-    }
+    headers = {**_ACCEPT_HEADERS, 'Authorization': f'Bearer {token}'}
     
-    availability_url = (
-        f"https://api.production.sohohousedigital.com/tables/availabilities"
-        f"?filter[restaurant_id]={venue_id}"
-        f"&filter[start_date_time]={date_time}"
-        f"&filter[party_size]={party_size}"
-        f"&filter[search_alternatives]=true"
-        f"&include=venue,restaurant"
-    )
+    availability_url = _availability_url(venue_id, date_time, party_size)
     
-    response = requests.get(availability_url, headers=headers, verify=False)
+    response = SESSION.get(availability_url, headers=headers, timeout=_TIMEOUT)
     
     if response.status_code == 200:
-        data = response.json()
+        data = orjson.loads(response.content)
         
-        # Debug: print full response
-        print(f"Full availability response: {json.dumps(data, indent=2)}")
+        # Debug: log full response (only pretty-printed when DEBUG is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Full availability response: %s", orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
         
         available_data = data.get('data', [])
         
         # Check if we're getting restaurant options or time slots
         if available_data and isinstance(available_data[0], dict):
-            first_item = available_data[0]
-            
             # If it has a type of 'restaurants' or similar, these are venue options
-            if first_item.get('type') == 'restaurants' or not first_item.get('attributes', {}).get('start_date_time'):
+            if not _is_time_slots(available_data):
                 # These are restaurant options, not time slots
                 formatted_venues = []
                 for item in available_data:
@@ -431,72 +570,130 @@ def check_poolside_availability(token):
             "response": response.text
         }), response.status_code
 
+# Probe availability at every candidate venue at once, then book the first one (in the
+# given order) that came back with availability. The probes are pure network waits, so
+# running them on the thread pool turns N sequential round trips into roughly one.
+@app.route("/book-best-poolside/<token>", methods=['POST'])
+def book_best_poolside(token):
+    """Check availability at several venues in parallel and book the best one"""
+    
+    data = _json_body()
+    venues = data.get('venues', ['NY_POOLSIDE', 'DUMBO_DECK'])
+    party_size = data.get('party_size', 2)
+    phone_number = data.get('phone_number', '7709255248')
+    date_time = data.get('date_time')
+    if not date_time:
+        date_time = f"{(datetime.now(BOOKING_TZ).date() + timedelta(days=2)).isoformat()}T13:30"
+    
+    headers = {**_ACCEPT_HEADERS, 'Authorization': f'Bearer {token}'}
+    
+    def probe(venue_id):
+        try:
+            response = SESSION.get(
+                _availability_url(venue_id, date_time, party_size),
+                headers=headers,
+                timeout=5
+            )
+        except requests.exceptions.RequestException as e:
+            return {"venue": venue_id, "status": None, "available": False, "error": str(e)}
+        
+        # search_alternatives can answer with other restaurants instead of slots, which
+        # doesn't count as availability at this venue
+        available = False
+        if response.status_code == 200:
+            try:
+                body = orjson.loads(response.content)
+            except ValueError:
+                body = None
+            if isinstance(body, dict):
+                available = _is_time_slots(body.get('data'))
+        return {"venue": venue_id, "status": response.status_code, "available": available}
+    
+    probes = list(EXECUTOR.map(probe, venues))
+    logger.info("Availability probes: %s", probes)
+    
+    for result in probes:
+        if not result['available']:
+            continue
+        
+        venue_id = result['venue']
+        try:
+            payload, status = _book_poolside_impl(token, venue_id, date_time, party_size, phone_number)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Request to Soho failed at %s (%s), trying next venue...", venue_id, e)
+            continue
+        if status == 200:
+            return jsonify(payload)
+        if payload.get('outcome_unknown'):
+            # The booking may have gone through, booking another venue could double book
+            return jsonify(payload), status
+        logger.info("Failed at %s, trying next venue...", venue_id)
+    
+    return jsonify({
+        "error": "Failed to book at any venue",
+        "date_time": date_time,
+        "probes": probes
+    }), 400
+
+# Pool venue IDs from the captured data. Static, so the JSON body is built once at import.
+POOL_VENUES = {
+    "new_york": {
+        "pool": "NY_POOL",
+        "poolside_restaurant": "NY_POOLSIDE",
+        "premium_pool": "NY_PREM_POOL"
+    },
+    "miami": {
+        "pool": "MIAMI_POOL",
+        "cabanas": "MIAMI_CABANAS"
+    },
+    "white_city": {
+        "pool": "WC_POOL"
+    },
+    "shoreditch": {
+        "pool": "SHP_POOL"
+    },
+    "barcelona": {
+        "pool": "BCL_POOL"
+    },
+    "dumbo": {
+        "pool": "DUMBO_POOL",
+        "premium_pool": "DUMBO_PREM_POOL"
+    },
+    "chicago": {
+        "pool": "CHIGO_POOL"
+    },
+    "los_angeles": {
+        "pool_deck": "DTLA_POOL_DECK"
+    }
+}
+_POOL_VENUES_JSON = orjson.dumps(POOL_VENUES)
+
 @app.route("/pool-venues", methods=['GET'])
 def get_pool_venues():
     """Get list of pool venue IDs from the captured data"""
-    
-    pool_venues = {
-        "new_york": {
-            "pool": "NY_POOL",
-            "poolside_restaurant": "NY_POOLSIDE",
-            "premium_pool": "NY_PREM_POOL"
-        },
-        "miami": {
-            "pool": "MIAMI_POOL",
-            "cabanas": "MIAMI_CABANAS"
-        },
-        "white_city": {
-            "pool": "WC_POOL"
-        },
-        "shoreditch": {
-            "pool": "SHP_POOL"
-        },
-        "barcelona": {
-            "pool": "BCL_POOL"
-        },
-        "dumbo": {
-            "pool": "DUMBO_POOL",
-            "premium_pool": "DUMBO_PREM_POOL"
-        },
-        "chicago": {
-            "pool": "CHIGO_POOL"
-        },
-        "los_angeles": {
-            "pool_deck": "DTLA_POOL_DECK"
-        }
-    }
-    
-    return jsonify(pool_venues)
+    return Response(_POOL_VENUES_JSON, mimetype='application/json')
 
 @app.route("/test-token/<token>", methods=['GET'])
 def test_token(token):
     """Test if the Bearer token works by fetching account info"""
     
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Accept': '*/*',
-        'Content-Type': 'application/vnd.api+json',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'User-Time-Zone': 'America/New_York',
-        'User-Agent': 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Cache-Control': 'no-cache'
-    }
+    headers = {**_ACCOUNT_HEADERS, 'Authorization': f'Bearer {token}'}
     
-    url = "https://api.production.sohohousedigital.com/profiles/accounts/me?include=profile,membership,features,favorite_venues,favorite_content_categories,profile.mutual_connection_requests,profile.mutual_connections,local_house,latest_attendance&updated_after=0001-01-01T00:00:00Z"
+    url = f"{SOHO_API_BASE_URL}/profiles/accounts/me?include=profile,membership,features,favorite_venues,favorite_content_categories,profile.mutual_connection_requests,profile.mutual_connections,local_house,latest_attendance&updated_after=0001-01-01T00:00:00Z"
     
-    print(f"Testing token: {token[:20]}...")
-    print(f"URL: {url}")
-    print(f"Headers: {headers}")
+    logger.info("Testing token: %s...", token[:20])
+    logger.debug("URL: %s", url)
+    logger.debug("Headers: %s", headers)
     
-    response = requests.get(url, headers=headers, verify=False)
+    response = SESSION.get(url, headers=headers, timeout=_TIMEOUT)
     
-    print(f"Response Status: {response.status_code}")
-    print(f"Response Headers: {dict(response.headers)}")
-    print(f"Response Body: {response.text[:500]}")
+    logger.info("Response Status: %s", response.status_code)
+    logger.debug("Response Headers: %s", response.headers)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Response Body: %s", response.text[:500])
     
     if response.status_code == 200:
-        account_data = response.json()
+        account_data = orjson.loads(response.content)
         
         # Extract useful info
         data = account_data.get('data', {})
@@ -527,161 +724,83 @@ def test_token(token):
             }
         })
 
+# Upstream timeouts/connection errors become a 502 instead of an HTML 500 page
+@app.errorhandler(requests.exceptions.RequestException)
+def handle_upstream_error(e):
+    return jsonify({
+        "error": "Request to Soho House failed",
+        "details": str(e)
+    }), 502
+
 # Cleanup old sessions periodically
+@app.teardown_request
+def flush_logs(exc):
+    """Write out the log records buffered during the request in one go"""
+    LOG_HANDLER.flush()
+
 @app.before_request
 def cleanup_sessions():
     current_time = time.time()
-    expired = [sid for sid, data in oauth_sessions.items() 
-               if current_time - data['created_at'] > 600]  # 10 min timeout
-    for sid in expired:
-        del oauth_sessions[sid]
+    # At most once a minute, and only pop the sessions that have actually expired
+    if current_time - _last_cleanup[0] < 60:
+        return
+    _last_cleanup[0] = current_time
+    while _session_heap and _session_heap[0][0] < current_time:
+        _, sid = heapq.heappop(_session_heap)
+        oauth_sessions.pop(sid, None)
 
 @app.route("/test-lock/<token>", methods=['POST'])
 def test_lock(token):
     """Test locking a table with different parameters"""
     
-    data = request.json
+    data = _json_body()
     venue_id = data.get('venue_id', 'NY_POOLSIDE')
     date_time = data.get('date_time')
     party_size = data.get('party_size', 1)
     
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'User-Agent': 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)'
-    }
-    
-    # Try different lock request formats
-    attempts = []
-    
-    # Attempt 1: Basic format
-    lock_data_1 = {
-        "data": {
-            "type": "table_locks",
-            "attributes": {
-                "party_size": party_size,
-                "extra_attribute": "default",
-                "date_time": date_time
-            },
-            "relationships": {
-                "restaurant": {
-                    "data": {
-                        "type": "restaurants",
-                        "id": venue_id
-                    }
-                }
-            }
-        }
-    }
-    
-    response = requests.post(
-        "https://api.production.sohohousedigital.com/tables/locks?include=venue,restaurant",
-        json=lock_data_1,
-        headers=headers,
-        verify=False
-    )
-    
-    attempts.append({
-        "attempt": 1,
-        "description": "Basic format with extra_attribute",
-        "status": response.status_code,
-        "response": response.text[:200]
-    })
-    
-    if response.status_code in [200, 201]:
-        return jsonify({
-            "success": True,
-            "working_format": 1,
-            "lock_response": response.json()
-        })
-    
-    # Attempt 2: Without extra_attribute
-    lock_data_2 = {
-        "data": {
-            "type": "table_locks",
-            "attributes": {
-                "party_size": party_size,
-                "date_time": date_time
-            },
-            "relationships": {
-                "restaurant": {
-                    "data": {
-                        "type": "restaurants",
-                        "id": venue_id
-                    }
-                }
-            }
-        }
-    }
-    
-    response = requests.post(
-        "https://api.production.sohohousedigital.com/tables/locks?include=venue,restaurant",
-        json=lock_data_2,
-        headers=headers,
-        verify=False
-    )
-    
-    attempts.append({
-        "attempt": 2,
-        "description": "Without extra_attribute",
-        "status": response.status_code,
-        "response": response.text[:200]
-    })
-    
-    if response.status_code in [200, 201]:
-        return jsonify({
-            "success": True,
-            "working_format": 2,
-            "lock_response": response.json()
+    headers = _bearer_json_headers(token)
+    
+    restaurant = {"data": {"type": "restaurants", "id": venue_id}}
+    venue = {"data": {"type": "venues", "id": venue_id}}
+    
+    # Different lock request formats to try, in order
+    variants = [
+        ("Basic format with extra_attribute", {
+            "attributes": {"party_size": party_size, "extra_attribute": "default", "date_time": date_time},
+            "relationships": {"restaurant": restaurant}
+        }),
+        ("Without extra_attribute", {
+            "attributes": {"party_size": party_size, "date_time": date_time},
+            "relationships": {"restaurant": restaurant}
+        }),
+        ("With venue relationship", {
+            "attributes": {"party_size": party_size, "extra_attribute": "default", "date_time": date_time},
+            "relationships": {"restaurant": restaurant, "venue": venue}
         })
+    ]
     
-    # Attempt 3: With venue relationship too
-    lock_data_3 = {
-        "data": {
-            "type": "table_locks",
-            "attributes": {
-                "party_size": party_size,
-                "extra_attribute": "default",
-                "date_time": date_time
-            },
-            "relationships": {
-                "restaurant": {
-                    "data": {
-                        "type": "restaurants",
-                        "id": venue_id
-                    }
-                },
-                "venue": {
-                    "data": {
-                        "type": "venues",
-                        "id": venue_id
-                    }
-                }
-            }
-        }
-    }
-    
-    response = requests.post(
-        "https://api.production.sohohousedigital.com/tables/locks?include=venue,restaurant",
-        json=lock_data_3,
-        headers=headers,
-        verify=False
-    )
-    
-    attempts.append({
-        "attempt": 3,
-        "description": "With venue relationship",
-        "status": response.status_code,
-        "response": response.text[:200]
-    })
-    
-    if response.status_code in [200, 201]:
-        return jsonify({
-            "success": True,
-            "working_format": 3,
-            "lock_response": response.json()
+    attempts = []
+    for attempt, (description, lock_body) in enumerate(variants, start=1):
+        response = SESSION.post(
+            f"{SOHO_API_BASE_URL}/tables/locks?include=venue,restaurant",
+            json={"data": {"type": "table_locks", **lock_body}},
+            headers=headers,
+            timeout=_TIMEOUT
+        )
+        
+        attempts.append({
+            "attempt": attempt,
+            "description": description,
+            "status": response.status_code,
+            "response": response.text[:200]
         })
+        
+        if response.status_code in [200, 201]:
+            return jsonify({
+                "success": True,
+                "working_format": attempt,
+                "lock_response": orjson.loads(response.content)
+            })
     
     return jsonify({
         "success": False,
@@ -694,6 +813,14 @@ def test_lock(token):
         }
     })
 
+# Slot start times (every 15 min from 8:00 to 20:00), built once at import
+_SLOT_TAILS = tuple(f'{h:02d}:{m:02d}' for h in range(8, 21) for m in (0, 15, 30, 45) if not (h == 20 and m > 0))
+
+@lru_cache(maxsize=128)
+def _slots_for(date):
+    """Get the list of slot start date_times for a given date"""
+    return [f'{date}T{t}' for t in _SLOT_TAILS]
+
 @app.route("/poolside-slots/<token>", methods=['GET'])
 def get_poolside_slots(token):
     """Get available poolside time slots"""
@@ -702,57 +829,7 @@ def get_poolside_slots(token):
     date = request.args.get('date', '2025-06-03')
     
     # Poolside bookings are typically in 3-hour slots from 8am to 8pm
-    time_slots = [
-        f"{date}T08:00",
-        f"{date}T08:15", 
-        f"{date}T08:30",
-        f"{date}T08:45",
-        f"{date}T09:00",
-        f"{date}T09:15",
-        f"{date}T09:30",
-        f"{date}T09:45",
-        f"{date}T10:00",
-        f"{date}T10:15",
-        f"{date}T10:30",
-        f"{date}T10:45",
-        f"{date}T11:00",
-        f"{date}T11:15",
-        f"{date}T11:30",
-        f"{date}T11:45",
-        f"{date}T12:00",
-        f"{date}T12:15",
-        f"{date}T12:30",
-        f"{date}T12:45",
-        f"{date}T13:00",
-        f"{date}T13:15",
-        f"{date}T13:30",
-        f"{date}T13:45",
-        f"{date}T14:00",
-        f"{date}T14:15",
-        f"{date}T14:30",
-        f"{date}T14:45",
-        f"{date}T15:00",
-        f"{date}T15:15",
-        f"{date}T15:30",
-        f"{date}T15:45",
-        f"{date}T16:00",
-        f"{date}T16:15",
-        f"{date}T16:30",
-        f"{date}T16:45",
-        f"{date}T17:00",
-        f"{date}T17:15",
-        f"{date}T17:30",
-        f"{date}T17:45",
-        f"{date}T18:00",
-        f"{date}T18:15",
-        f"{date}T18:30",
-        f"{date}T18:45",
-        f"{date}T19:00",
-        f"{date}T19:15",
-        f"{date}T19:30",
-        f"{date}T19:45",
-        f"{date}T20:00"
-    ]
+    time_slots = _slots_for(date)
     
     return jsonify({
         "venue": venue_id,
@@ -765,35 +842,93 @@ def get_poolside_slots(token):
 def save_json_file(filepath, data):
     """Helper function to save JSON with error handling"""
     try:
-        directory = os.path.dirname(filepath)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        
-        temp_file = filepath + '.tmp'
-        with open(temp_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        # DATA_DIR is created at startup, so no per-save directory check is needed.
+        # Serialize up front (orjson gives bytes directly) so the file is written with a
+        # single write() call.
+        data_bytes = orjson.dumps(data)
+        # Temp name is unique per process/thread so concurrent saves can't clobber each other
+        temp_file = f"{filepath}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(temp_file, 'wb') as f:
+            f.write(data_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_file, filepath)
         
-        os.rename(temp_file, filepath)
+        if filepath == TOKENS_FILE:
+            invalidate_token_cache()
+            # New tokens (/save-tokens, /complete-auth) make a coalesced refresh result stale.
+            # A refresh sets its own result only after this save returns.
+            _LAST_REFRESH.update(ts=0.0, result=None)
+            _publish('status', orjson.dumps(_token_status()))
         
-        print(f"Successfully saved file: {filepath}")
+        logger.info("Successfully saved file: %s", filepath)
         return True
     except Exception as e:
-        print(f"Error saving file {filepath}: {e}")
+        logger.error("Error saving file %s: %s", filepath, e)
         return False
 
 def load_json_file(filepath):
     """Helper function to load JSON with error handling"""
     try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        print(f"Successfully loaded file: {filepath}")
+        with open(filepath, 'rb') as f:
+            data = orjson.loads(f.read())
+        logger.info("Successfully loaded file: %s", filepath)
         return data
     except FileNotFoundError:
-        print(f"File not found: {filepath}")
+        logger.info("File not found: %s", filepath)
         return None
     except Exception as e:
-        print(f"Error loading file {filepath}: {e}")
+        logger.error("Error loading file %s: %s", filepath, e)
+        return None
+
+# In-memory copy of the tokens file, only re-read when the file's mtime changes
+_TOKEN_CACHE = {'mtime': 0, 'data': None}
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+def get_tokens_cached():
+    """Load the stored tokens, serving them from memory while the file is unchanged"""
+    try:
+        mtime = os.stat(TOKENS_FILE).st_mtime
+    except FileNotFoundError:
         return None
+    
+    with _TOKEN_CACHE_LOCK:
+        if _TOKEN_CACHE['data'] is not None and mtime == _TOKEN_CACHE['mtime']:
+            return _TOKEN_CACHE['data']
+        
+        data = load_json_file(TOKENS_FILE)
+        _TOKEN_CACHE.update(mtime=mtime, data=data)
+        return data
+
+def invalidate_token_cache():
+    """Force the next get_tokens_cached() call to re-read the tokens file"""
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE.update(mtime=0, data=None)
+
+# In-memory copy of the last booking status, served pre-serialized with an ETag so
+# dashboard polling is a dict lookup (or a 304) instead of a disk read + parse
+_LAST_BOOKING_DEFAULT = {
+    "status": "No bookings yet",
+    "time": "N/A",
+    "venue": "N/A",
+    "booking_time": "N/A"
+}
+_LAST_BOOKING_CACHE = {'body': None, 'etag': None}
+
+def _cache_last_booking(data):
+    """Store the serialized last booking status and its ETag in memory"""
+    body = orjson.dumps(data or _LAST_BOOKING_DEFAULT)
+    _LAST_BOOKING_CACHE.update(body=body, etag=hashlib.sha1(body).hexdigest())
+
+def _persist_last_booking(data):
+    """Save the last booking status to disk, update the in-memory copy and push it to the dashboard"""
+    _cache_last_booking(data)
+    save_json_file(LAST_BOOKING_FILE, data)
+    _publish('booking', _LAST_BOOKING_CACHE['body'])
+
+# Only hit the disk once, on cold start
+_cache_last_booking(load_json_file(LAST_BOOKING_FILE))
 
 # Add a debug endpoint to check volume status
 @app.route("/debug-volume", methods=['GET'])
@@ -832,7 +967,7 @@ def debug_volume():
 @app.route("/save-tokens", methods=['POST'])
 def save_tokens():
     """Save tokens to a file for later use"""
-    data = request.json
+    data = _json_body()
     access_token = data.get('access_token')
     refresh_token = data.get('refresh_token')
     
@@ -862,17 +997,55 @@ def save_tokens():
         "data_dir": DATA_DIR
     }), 500
 
-# Endpoint to refresh token using stored refresh token
-@app.route("/refresh-token", methods=['POST'])
-def refresh_token_endpoint():
-    """Refresh the access token using stored refresh token"""
-    token_data = load_json_file(TOKENS_FILE)
+# Concurrent refreshes (cron + auto-book + dashboard) are coalesced: one caller talks to the
+# identity server under the lock, and anyone arriving within REFRESH_COALESCE_SECONDS of a
+# successful refresh just gets that result back.
+REFRESH_COALESCE_SECONDS = 30
+# Tokens with more life than this left are returned as-is, without calling the identity server
+REFRESH_SHORTCUT_SECONDS = 600
+_REFRESH_LOCK = threading.Lock()
+_LAST_REFRESH = {'ts': 0.0, 'result': None}
+
+def _recent_refresh_result():
+    if _LAST_REFRESH['result'] and time.time() - _LAST_REFRESH['ts'] < REFRESH_COALESCE_SECONDS:
+        return _LAST_REFRESH['result']
+    return None
+
+def _refresh_access_token():
+    """Refresh the stored access token if needed, returns (payload, status)"""
+    result = _recent_refresh_result()
+    if result:
+        return result
+    
+    with _REFRESH_LOCK:
+        # Another caller may have finished a refresh while we were waiting on the lock
+        result = _recent_refresh_result()
+        if result:
+            return result
+        
+        result = _do_refresh_access_token()
+        if result[1] == 200:
+            _LAST_REFRESH.update(ts=time.time(), result=result)
+        return result
+
+def _do_refresh_access_token():
+    token_data = get_tokens_cached()
     if not token_data:
-        return jsonify({"error": "No stored tokens found"}), 404
+        return {"error": "No stored tokens found"}, 404
+    
+    # Don't bother the identity server while the current access token is still good
+    remaining = token_data.get('created_at', 0) + token_data.get('expires_in', 7200) - int(time.time())
+    if remaining > REFRESH_SHORTCUT_SECONDS and token_data.get('access_token'):
+        return {
+            "success": True,
+            "cached": True,
+            "access_token": token_data.get('access_token'),
+            "expires_in": remaining
+        }, 200
     
     refresh_token = token_data.get('refresh_token')
     if not refresh_token:
-        return jsonify({"error": "No refresh token found"}), 400
+        return {"error": "No refresh token found"}, 400
     
     data = {
         "client_id": CLIENT_ID,
@@ -880,75 +1053,77 @@ def refresh_token_endpoint():
         "refresh_token": refresh_token
     }
     
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': '*/*',
-        'User-Agent': 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)'
-    }
-    
-    response = requests.post(
+    response = SESSION.post(
         f"{IDENTITY_BASE_URL}/oauth/token",
         json=data,
-        headers=headers,
-        verify=False
+        headers=_IDENTITY_HEADERS,
+        timeout=_TIMEOUT
     )
     
     if response.status_code == 200:
-        new_token_data = response.json()
+        new_token_data = orjson.loads(response.content)
+        new_token_data.setdefault('created_at', int(time.time()))
         
         # Save the new tokens
         if save_json_file(TOKENS_FILE, new_token_data):
-            return jsonify({
+            return {
                 "success": True,
                 "access_token": new_token_data.get('access_token'),
                 "expires_in": new_token_data.get('expires_in')
-            })
+            }, 200
         else:
-            return jsonify({
+            return {
                 "error": "Failed to save refreshed tokens",
                 "access_token": new_token_data.get('access_token')
-            }), 500
+            }, 500
     else:
-        return jsonify({
+        return {
             "error": "Failed to refresh token",
             "status": response.status_code,
             "response": response.text
-        }), 500
+        }, 500
+
+# Endpoint to refresh token using stored refresh token
+@app.route("/refresh-token", methods=['POST'])
+def refresh_token_endpoint():
+    """Refresh the access token using stored refresh token"""
+    payload, status = _refresh_access_token()
+    return jsonify(payload), status
 
 # Endpoint to automatically book using stored tokens
 # This is the main booking endpoint that will be used for automated bookings
 # It will try to book at multiple venues in order until successful or all fail.
-@app.route("/auto-book", methods=['POST', 'GET'])
-def auto_book():
-    """Automatically book using stored tokens"""
-    print("\n=== AUTO-BOOK CALLED ===")
+def _auto_book_impl(data):
+    """Book the first venue we can get with the stored tokens, returns (payload, status)"""
+    logger.info("=== AUTO-BOOK CALLED ===")
     
-    token_data = load_json_file(TOKENS_FILE)
+    token_data = get_tokens_cached()
     if not token_data:
-        return jsonify({"error": "No stored tokens. Please authenticate first."}), 404
+        return {"error": "No stored tokens. Please authenticate first."}, 404
     
     # Check if token needs refresh
     created_at = token_data.get('created_at', 0)
     expires_in = token_data.get('expires_in', 7200)
     
-    if time.time() > created_at + expires_in - 300:  # 5 min buffer
-        refresh_response = refresh_token_endpoint()
-        if isinstance(refresh_response, tuple) and refresh_response[1] != 200:
-            return jsonify({
+    if time.time() > created_at + expires_in - TOKEN_REFRESH_BUFFER:
+        # The refresh and the lock/book calls go to different hosts, so open the API host
+        # connection on the pool while we wait on the identity server
+        EXECUTOR.submit(_prewarm_connection, f"{SOHO_API_BASE_URL}/")
+        refresh_payload, refresh_status = _refresh_access_token()
+        if refresh_status != 200:
+            return {
                 "error": "Token expired and refresh failed. Please re-authenticate.",
                 "hint": "Use GET /start-auth to begin manual authentication"
-            }), 401
+            }, 401
         
-        token_data = load_json_file(TOKENS_FILE)
-        if not token_data:
-            return jsonify({"error": "Failed to reload tokens after refresh"}), 500
-    
-    access_token = token_data.get('access_token')
+        # The refresh result already carries the new token, no need to re-read the file
+        access_token = refresh_payload.get('access_token')
+    else:
+        access_token = token_data.get('access_token')
     
-    try:
-        data = request.get_json(force=True, silent=True) or {}
-    except:
-        data = {}
+    # One clock read per attempt, shared by the default date and both status records
+    now = datetime.now(BOOKING_TZ)
+    attempt_time = now.strftime(_STATUS_TIME_FMT)
         
     venues = data.get('venues', ['NY_POOLSIDE','DUMBO_DECK'])
     date_time = data.get('date_time')
@@ -957,121 +1132,99 @@ def auto_book():
     
     if not date_time:
         # Default to 48 hours from now at 1:30 PM 
-        booking_date = datetime.now() + timedelta(days=2)
-        date_time = booking_date.strftime('%Y-%m-%d') + 'T13:30'
-    
-    for venue_id in venues:
-        print(f"\n=== Trying venue: {venue_id} ===")
+        date_time = f"{(now.date() + timedelta(days=2)).isoformat()}T13:30"
+    
+    headers = _bearer_json_headers(access_token)
+    
+    def try_lock(venue_id):
+        try:
+            lock_response = _lock_table(headers, venue_id, date_time, party_size)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Request to Soho failed locking %s: %s", venue_id, e)
+            return None
+        if lock_response.status_code not in [200, 201]:
+            logger.info("Failed to lock %s: %s", venue_id, lock_response.status_code)
+            return None
+        return orjson.loads(lock_response.content).get('data', {})
+    
+    # Fire the lock requests for every venue at once so we don't lose the slot waiting on
+    # earlier venues to fail. A lock is only a short hold that expires on its own, so we
+    # still only *book* one venue: the first one, in preference order, that we got a lock for.
+    # EXECUTOR.map yields in order, so if the top venue locks we book it without waiting.
+    for venue_id, lock_info in zip(venues, EXECUTOR.map(try_lock, venues)):
+        if lock_info is None:
+            continue
         
-        # Create a new request context with the venue_id
-        with app.test_request_context(
-            json={
-                'venue_id': venue_id,
-                'date_time': date_time,
-                'party_size': party_size,
-                'phone_number': phone_number,
-                'phone_country_code': 'US'
-            }
-        ):
-            result = book_poolside(access_token)
-            
-            # Check if booking was successful
-            if isinstance(result, tuple):
-                response_json, status_code = result
-                if status_code == 200:
-                    # Save success status
-                    save_json_file(LAST_BOOKING_FILE, {
-                        'status': f'Success: Booked {venue_id}',
-                        'time': datetime.now().strftime('%Y-%m-%d %I:%M %p'),
-                        'venue': venue_id,
-                        'booking_time': date_time
-                    })
-                    return response_json
-                else:
-                    print(f"Failed at {venue_id}, trying next venue...")
-            else:
-                try:
-                    result_data = result.get_json()
-                    if result_data.get('success'):
-                        # Save success status
-                        save_json_file(LAST_BOOKING_FILE, {
-                            'status': f'Success: Booked {venue_id}',
-                            'time': datetime.now().strftime('%Y-%m-%d %I:%M %p'),
-                            'venue': venue_id,
-                            'booking_time': date_time
-                        })
-                        return result
-                except:
-                    pass
-    
-    save_json_file(LAST_BOOKING_FILE, {
+        logger.info("=== Booking venue: %s ===", venue_id)
+        try:
+            payload, status = _complete_booking(headers, lock_info, venue_id, date_time, party_size, phone_number)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Request to Soho failed at %s (%s), trying next venue...", venue_id, e)
+            continue
+        
+        if status == 200:
+            # Save success status
+            _persist_last_booking({
+                'status': f'Success: Booked {venue_id}',
+                'time': attempt_time,
+                'venue': venue_id,
+                'booking_time': date_time
+            })
+            return payload, 200
+        
+        if payload.get('outcome_unknown'):
+            # The booking may have gone through, booking another venue could double book
+            _persist_last_booking({
+                'status': f'Unknown: Booking request to {venue_id} got no answer, check the Soho House app',
+                'time': attempt_time,
+                'venue': venue_id,
+                'booking_time': date_time
+            })
+            return payload, status
+        
+        logger.info("Failed at %s, trying next venue...", venue_id)
+    
+    _persist_last_booking({
         'status': f'Failed: No venues available',
-        'time': datetime.now().strftime('%Y-%m-%d %I:%M %p'),
+        'time': attempt_time,
         'venues_tried': venues
     })
     
-    return jsonify({
+    return {
         "error": "Failed to book at any venue",
         "venues_tried": venues,
         "date_time": date_time
-    }), 400
+    }, 400
+
+@app.route("/auto-book", methods=['POST', 'GET'])
+def auto_book():
+    """Automatically book using stored tokens"""
+    payload, status = _auto_book_impl(_json_body(silent=True))
+    return jsonify(payload), status
 
 @app.route("/quick-book", methods=['POST'])
 def quick_book():
     """Quick book endpoint for testing"""
-    print("\n=== QUICK-BOOK ENDPOINT ===")
+    logger.info("=== QUICK-BOOK ENDPOINT ===")
     
-    try:
-        with open('soho_tokens.json', 'r') as f:
-            token_data = json.load(f)
-    except FileNotFoundError:
+    token_data = get_tokens_cached()
+    if not token_data:
         return jsonify({"error": "No stored tokens. Please authenticate first."}), 404
     
     access_token = token_data.get('access_token')
     
-    data = request.json or {}
+    data = _json_body()
     venue_id = data.get('venue_id', 'DUMBO_DECK')
     date_time = data.get('date_time', '2025-06-03T08:00')
     party_size = data.get('party_size', 1)
     phone_number = data.get('phone_number', '7709255248')
     
-    print(f"Booking {venue_id} at {date_time} for {party_size} people")
+    logger.info("Booking %s at %s for %s people", venue_id, date_time, party_size)
     
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'User-Agent': 'DigitalHouse/8.129 (com.sohohouse.houseseven; build:17190; iOS 18.5.0)'
-    }
+    headers = _bearer_json_headers(access_token)
     
     # Lock the table
-    lock_data = {
-        "data": {
-            "type": "table_locks",
-            "attributes": {
-                "party_size": party_size,
-                "extra_attribute": "default",
-                "date_time": date_time
-            },
-            "relationships": {
-                "restaurant": {
-                    "data": {
-                        "type": "restaurants",
-                        "id": venue_id
-                    }
-                }
-            }
-        }
-    }
-    
-    print(f"Locking {venue_id}...")
-    
-    lock_response = requests.post(
-        "https://api.production.sohohousedigital.com/tables/locks?include=venue,restaurant",
-        json=lock_data,
-        headers=headers,
-        verify=False
-    )
+    lock_response = _lock_table(headers, venue_id, date_time, party_size)
     
     if lock_response.status_code not in [200, 201]:
         return jsonify({
@@ -1081,382 +1234,229 @@ def quick_book():
             "response": lock_response.text
         }), lock_response.status_code
     
-    lock_info = lock_response.json().get('data', {})
-    lock_id = lock_info.get('id')
+    lock_info = orjson.loads(lock_response.content).get('data', {})
     
-    # Create booking
-    booking_data = {
-        "data": {
-            "type": "table_bookings",
-            "attributes": {
-                "date_time": date_time,
-                "party_size": party_size,
-                "phone": {
-                    "country_code": "US",
-                    "number": phone_number
-                },
-                "guest_notes": "",
-                "terms_consent": True,
-                "guest_consent": True
-            },
-            "relationships": {
-                "restaurant": {
-                    "data": {
-                        "type": "restaurants",
-                        "id": venue_id
-                    }
-                },
-                "table_lock": {
-                    "data": {
-                        "type": "table_locks",
-                        "id": lock_id
-                    }
-                }
-            }
-        }
-    }
+    # Create booking. _complete_booking reports a POST that failed after being sent as
+    # outcome_unknown (504) rather than letting it become a generic 502.
+    payload, status = _complete_booking(headers, lock_info, venue_id, date_time, party_size, phone_number)
     
-    booking_response = requests.post(
-        "https://api.production.sohohousedigital.com/tables/table_bookings?include=venue,restaurant",
-        json=booking_data,
-        headers=headers,
-        verify=False
-    )
-    
-    if booking_response.status_code in [200, 201]:
-        booking_info = booking_response.json().get('data', {})
+    if status == 200:
         return jsonify({
             "success": True,
-            "booking_id": booking_info.get('id'),
+            "booking_id": payload.get('booking_id'),
             "venue": venue_id,
             "date_time": date_time
         })
-    else:
-        return jsonify({
-            "error": "Failed to create booking",
-            "status": booking_response.status_code,
-            "response": booking_response.text
-        }), booking_response.status_code
+    # Failed bookings pass Soho's status through, outcome_unknown keeps its 504
+    return jsonify(payload), payload.get('status', status)
 
 # check booking status 
 @app.route("/last-booking-status", methods=['GET'])
 def get_last_booking_status():
-    """Get the last booking status from the file"""
-    booking_data = load_json_file(LAST_BOOKING_FILE)
-    if booking_data:
-        return jsonify(booking_data)
-    else:
-        return jsonify({
-            "status": "No bookings yet",
-            "time": "N/A",
-            "venue": "N/A",
-            "booking_time": "N/A"
-        })
+    """Get the last booking status from memory"""
+    response = Response(_LAST_BOOKING_CACHE['body'], mimetype='application/json')
+    response.set_etag(_LAST_BOOKING_CACHE['etag'])
+    return response.make_conditional(request)
 
-# Simple dashboard to check bot status and perform actions
-# I should probably make this a proper HTML page with JS, but fuck it im lazy lol 
+# Simple dashboard to check bot status and perform actions, lives in static/index.html
 @app.route("/")
 def index():
     """Simple dashboard to check bot status"""
-    return '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Jeannie's BookingBot</title>
-        <style>
-            body { font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; }
-            .status { padding: 20px; margin: 20px 0; border-radius: 8px; }
-            .success { background-color: #d4edda; color: #155724; }
-            .error { background-color: #f8d7da; color: #721c24; }
-            .warning { background-color: #fff3cd; color: #856404; }
-            .info { background-color: #d1ecf1; color: #0c5460; }
-            button { padding: 10px 20px; margin: 5px; cursor: pointer; }
-            .booking-form { margin: 20px 0; padding: 20px; background: #f0f0f0; border-radius: 8px; }
-            input, select { padding: 8px; margin: 5px; width: 200px; }
-            .last-booking { 
-                margin: 20px 0; 
-                padding: 20px; 
-                background: #e8f4f8; 
-                border-radius: 8px; 
-                border: 2px solid #17a2b8;
-            }
-            .last-booking h3 { margin-top: 0; color: #17a2b8; }
-            .booking-details { 
-                display: grid; 
-                grid-template-columns: auto 1fr; 
-                gap: 10px; 
-                margin-top: 15px;
-            }
-            .booking-details dt { font-weight: bold; color: #666; }
-            .booking-details dd { margin: 0; }
-            .pulse { animation: pulse 2s infinite; }
-            @keyframes pulse {
-                0% { opacity: 1; }
-                50% { opacity: 0.5; }
-                100% { opacity: 1; }
-            }
-        </style>
-    </head>
-    <body>
-        <h1>Soho House Poolside Booking Bot 🏖️</h1>
-        
-        <!-- Last Booking Status -->
-        <div id="lastBooking" class="last-booking">
-            <h3>📅 Last Booking Status</h3>
-            <div id="bookingContent" class="pulse">Loading...</div>
-        </div>
-        
-        <div id="status"></div>
-        
-        <div style="margin-top: 30px; padding: 20px; background: #f8f9fa; border-radius: 5px;">
-            <h3>Complete Authentication</h3>
-            <p style="font-size: 14px; color: #666;">After clicking "Start Authentication" and logging in, paste your details here. If token is expired, contact the greatest engineer in the world (Rahmin) to fix this.</p>
-            <form id="authForm">
-                <input type="text" id="session_id" placeholder="Session ID" style="width: 100%; padding: 8px; margin: 5px 0; border: 1px solid #ddd; border-radius: 3px;" required>
-                <input type="text" id="redirect_url" placeholder="Redirect URL (com.sohohouse.houseseven://...)" style="width: 100%; padding: 8px; margin: 5px 0; border: 1px solid #ddd; border-radius: 3px;" required>
-                <button type="submit" style="width: 100%; padding: 10px; background: #007bff; color: white; border: none; border-radius: 5px; cursor: pointer;">Complete Authentication</button>
-            </form>
-            <div id="auth_result" style="margin-top: 10px;"></div>
-        </div>
-        
-        
-        <div>
-            <h2>Actions</h2>
-            <button onclick="checkStatus()">Check Token Status</button>
-            <button onclick="refreshToken()">Refresh Token</button>
-            <button onclick="startAuth()">Re-authenticate</button>
-            <button onclick="checkLastBooking()">🔄 Refresh Booking Status</button>
-        </div>
-        
-        <div id="results"></div>
-        
-        <script>
-            async function checkLastBooking() {
-                try {
-                    const response = await fetch('/last-booking-status');
-                    const data = await response.json();
-                    
-                    const bookingDiv = document.getElementById('bookingContent');
-                    bookingDiv.classList.remove('pulse');
-                    
-                    // Check if booking was successful or failed
-                    const isSuccess = data.status && data.status.includes('Success');
-                    const isFailed = data.status && data.status.includes('Failed');
-                    
-                    // Format the booking time nicely
-                    let bookingTimeFormatted = 'N/A';
-                    if (data.booking_time && data.booking_time !== 'N/A') {
-                        const bookingDate = new Date(data.booking_time);
-                        bookingTimeFormatted = bookingDate.toLocaleString('en-US', {
-                            weekday: 'long',
-                            year: 'numeric',
-                            month: 'long',
-                            day: 'numeric',
-                            hour: 'numeric',
-                            minute: '2-digit',
-                            hour12: true
-                        });
-                    }
-                    
-                    if (isSuccess) {
-                        bookingDiv.innerHTML = `
-                            <div style="color: #155724;">
-                                <strong style="font-size: 1.2em;">✅ ${data.status}</strong>
-                                <dl class="booking-details">
-                                    <dt>Booking Time:</dt>
-                                    <dd>${bookingTimeFormatted}</dd>
-                                    <dt>Venue:</dt>
-                                    <dd>${data.venue === 'DUMBO_DECK' ? '🏖️ DUMBO Deck' : '🏊 NY Poolside'}</dd>
-                                    <dt>Last Updated:</dt>
-                                    <dd>${data.time}</dd>
-                                </dl>
-                            </div>
-                        `;
-                    } else if (isFailed) {
-                        const venuesList = data.venues_tried ? data.venues_tried.join(', ') : 'N/A';
-                        bookingDiv.innerHTML = `
-                            <div style="color: #721c24;">
-                                <strong style="font-size: 1.2em;">❌ ${data.status}</strong>
-                                <dl class="booking-details">
-                                    <dt>Attempted At:</dt>
-                                    <dd>${data.time}</dd>
-                                    <dt>Venues Tried:</dt>
-                                    <dd>${venuesList}</dd>
-                                </dl>
-                            </div>
-                        `;
-                    } else {
-                        bookingDiv.innerHTML = `
-                            <div style="color: #666;">
-                                <strong>No bookings recorded yet</strong>
-                                <p style="margin-top: 10px; font-size: 0.9em;">
-                                    Bookings will appear here after the cron job runs at 12:01 PM daily.
-                                </p>
-                            </div>
-                        `;
-                    }
-                } catch (error) {
-                    document.getElementById('bookingContent').innerHTML = 
-                        `<div style="color: #721c24;">Error loading booking status: ${error.message}</div>`;
-                }
-            }
-            
-            async function checkStatus() {
-                try {
-                    const response = await fetch('/status');
-                    const data = await response.json();
-                    const statusDiv = document.getElementById('status');
-                    
-                    if (data.token_valid) {
-                        statusDiv.className = 'status success';
-                        statusDiv.innerHTML = `
-                            <h3>✅ Token Valid</h3>
-                            <p>Expires in: ${Math.round(data.expires_in / 60)} minutes</p>
-                            <p>Auto-booking scheduled for 12:01 PM daily</p>
-                        `;
-                        alert('Token valid');
-                    } else {
-                        statusDiv.className = 'status error';
-                        statusDiv.innerHTML = `
-                            <h3>❌ Token Invalid</h3>
-                            <p>${data.error}</p>
-                            <p>Please re-authenticate</p>
-                        `;
-                        alert('Token invalid');
-                    }
-                } catch (error) {
-                    console.error('Error checking status:', error);
-                    document.getElementById('status').innerHTML = 
-                        `<div class="status error"><h3>❌ Error</h3><p>Failed to check status: ${error.message}</p></div>`;
-                }
-            }
-            
-            async function refreshToken() {
-                const response = await fetch('/refresh-token', { method: 'POST' });
-                const data = await response.json();
-                alert(data.success ? 'Token refreshed!' : 'Refresh failed: ' + data.error);
-                checkStatus();
-            }
-            
-            document.getElementById('authForm').addEventListener('submit', async function(event) {
-                event.preventDefault();
-                const sessionId = document.getElementById('session_id').value;
-                const redirectUrl = document.getElementById('redirect_url').value;
-                const resultDiv = document.getElementById('auth_result');
-                
-                resultDiv.innerHTML = '<div style="color: blue;">Processing...</div>';
-                
-                try {
-                    const response = await fetch('/complete-auth', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({
-                            session_id: sessionId,
-                            redirect_url: redirectUrl
-                        })
-                    });
-                    
-                    const data = await response.json();
-                    
-                    if (data.success) {
-                        resultDiv.innerHTML = '<div style="color: green;">✅ Authentication successful! Tokens saved. Reloading...</div>';
-                        setTimeout(() => location.reload(), 2000);
-                    } else {
-                        resultDiv.innerHTML = `<div style="color: red;">❌ Error: ${data.error || 'Authentication failed'}</div>`;
-                    }
-                } catch (error) {
-                    resultDiv.innerHTML = `<div style="color: red;">❌ Error: ${error.message}</div>`;
-                }
-            });
-            
-            async function startAuth() {
-                window.location.href = '/start-auth';
-            }
-            
-            async function bookNow() {
-                const venue = document.getElementById('venue').value;
-                const datetime = document.getElementById('datetime').value;
-                const party = document.getElementById('party').value;
-                
-                const response = await fetch('/auto-book', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({
-                        venues: [venue],
-                        date_time: datetime.replace('T', 'T'),
-                        party_size: parseInt(party)
-                    })
-                });
-                
-                const data = await response.json();
-                document.getElementById('results').innerHTML = 
-                    '<pre>' + JSON.stringify(data, null, 2) + '</pre>';
-                
-                // Refresh the booking status after manual booking
-                setTimeout(checkLastBooking, 1000);
-            }
-            
-            // Check status and last booking on load
-            checkStatus();
-            checkLastBooking();
-            
-            // Refresh status every minute
-            setInterval(checkStatus, 60000);
-            
-            // Refresh last booking every 30 seconds
-            setInterval(checkLastBooking, 30000);
-        </script>
-    </body>
-    </html>
-    '''
+    # static/index.html is served with an mtime-based ETag and SEND_FILE_MAX_AGE_DEFAULT,
+    # so repeat loads are 304s
+    response = app.send_static_file('index.html')
+    response.cache_control.public = True
+    response.cache_control.must_revalidate = True
+    return response
+
+def _token_status():
+    """Current token status as reported by /status"""
+    token_data = get_tokens_cached()
+    if not token_data:
+        return {
+            "token_valid": False,
+            "error": "No tokens found"
+        }
+    
+    created_at = token_data.get('created_at', 0)
+    expires_in = token_data.get('expires_in', 7200)
+    time_left = (created_at + expires_in) - time.time()
+    
+    if time_left > 0:
+        return {
+            "token_valid": True,
+            "expires_in": time_left,
+            "created_at": created_at
+        }
+    else:
+        return {
+            "token_valid": False,
+            "error": "Token expired"
+        }
+
 @app.route("/status", methods=['GET'])
 def get_status():
     """Check token status"""
-    try:
-        with open(TOKENS_FILE, 'r') as f:
-            token_data = json.load(f)
-        
-        created_at = token_data.get('created_at', 0)
-        expires_in = token_data.get('expires_in', 7200)
-        time_left = (created_at + expires_in) - time.time()
-        
-        if time_left > 0:
-            return jsonify({
-                "token_valid": True,
-                "expires_in": time_left,
-                "created_at": created_at
-            })
+    return jsonify(_token_status())
+
+# Server-Sent Events: the dashboard keeps one /events stream open and gets the last booking
+# and token status pushed when they change, instead of polling both endpoints.
+# Every open stream holds a worker thread, so gunicorn runs with the gthread worker, and
+# streams are capped well below its 16 threads so /auto-book never queues behind them.
+SSE_KEEPALIVE_SECONDS = 25
+SSE_MAX_SUBSCRIBERS = 6
+SSE_RETRY_SECONDS = 30
+_SUBSCRIBERS = set()
+_SUBSCRIBERS_LOCK = threading.Lock()
+
+def _sse_message(event, body):
+    """Frame an already-serialized JSON body as an SSE message"""
+    return b"event: " + event.encode() + b"\ndata: " + body + b"\n\n"
+
+def _publish(event, body):
+    """Push an event to every open /events stream"""
+    message = _sse_message(event, body)
+    with _SUBSCRIBERS_LOCK:
+        subscribers = list(_SUBSCRIBERS)
+    for subscriber in subscribers:
+        try:
+            subscriber.put_nowait(message)
+        except queue.Full:
+            pass  # that client is stuck, it will get the current state when it reconnects
+
+@app.route("/events", methods=['GET'])
+def events():
+    """Stream booking and token status updates to the dashboard"""
+    subscriber = queue.Queue(maxsize=16)
+    with _SUBSCRIBERS_LOCK:
+        if len(_SUBSCRIBERS) >= SSE_MAX_SUBSCRIBERS:
+            subscriber = None
         else:
-            return jsonify({
-                "token_valid": False,
-                "error": "Token expired"
-            })
-    except FileNotFoundError:
-        return jsonify({
-            "token_valid": False,
-            "error": "No tokens found"
-        })
+            _SUBSCRIBERS.add(subscriber)
+    if subscriber is None:
+        return Response(
+            f"retry: {SSE_RETRY_SECONDS * 1000}\n\n",
+            status=503,
+            mimetype='text/event-stream',
+            headers={'Retry-After': str(SSE_RETRY_SECONDS), 'Cache-Control': 'no-cache'}
+        )
+    
+    # Send the current state first so the page doesn't need separate initial fetches
+    initial = [
+        _sse_message('booking', _LAST_BOOKING_CACHE['body']),
+        _sse_message('status', orjson.dumps(_token_status()))
+    ]
+    
+    def stream():
+        yield from initial
+        while True:
+            try:
+                yield subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield b": keepalive\n\n"
+    
+    def unsubscribe():
+        with _SUBSCRIBERS_LOCK:
+            _SUBSCRIBERS.discard(subscriber)
+    
+    response = Response(
+        stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(unsubscribe)
+    return response
+
+# Open (and leave in SESSION's pool) TLS connections to the Soho hosts just before the
+# 12:00 booking rush, so the lock/book calls don't pay for a fresh handshake
+PREWARM_URLS = (f"{IDENTITY_BASE_URL}/", f"{SOHO_API_BASE_URL}/")
+
+def _prewarm_connection(url):
+    try:
+        SESSION.head(url, timeout=5)
+        return True
+    except requests.exceptions.RequestException as e:
+        logger.warning("Prewarm of %s failed: %s", url, e)
+        return False
+
+@app.route("/prewarm", methods=['POST'])
+def prewarm():
+    """Warm up keep-alive connections to the Soho hosts"""
+    warmed = dict(zip(PREWARM_URLS, EXECUTOR.map(_prewarm_connection, PREWARM_URLS)))
+    return jsonify({"warmed": warmed})
+
+# Optional in-process scheduler. With RUN_SCHEDULER_IN_PROCESS=1 the web process runs the
+# prewarm, daily booking and token refresh itself as plain function calls, so the separate
+# cron.py worker (and its HTTP round trips back into this app) isn't needed. Remove the
+# procfile worker when enabling it (cron.py also exits on start if it sees the flag).
+# Only enable it with a single gunicorn worker, otherwise every worker would book.
+RUN_SCHEDULER_IN_PROCESS = os.environ.get('RUN_SCHEDULER_IN_PROCESS', '').lower() in ('1', 'true', 'yes')
+SCHEDULED_REFRESH_SECONDS = 300  # cheap: no identity call until the token is inside REFRESH_SHORTCUT_SECONDS
+SCHEDULED_BOOKING = {
+    "venues": ["NY_POOLSIDE", "DUMBO_DECK"],
+    "party_size": 2,
+    "phone_number": "7709255248"
+}
+
+def _scheduled_prewarm():
+    list(EXECUTOR.map(_prewarm_connection, PREWARM_URLS))
+
+def _scheduled_auto_book():
+    payload, status = _auto_book_impl(dict(SCHEDULED_BOOKING))
+    logger.info("Scheduled auto-book finished (%s): %s", status, payload.get('booking_id') or payload.get('error'))
+
+def _scheduled_refresh():
+    payload, status = _refresh_access_token()
+    if status != 200:
+        logger.warning("Scheduled token refresh failed (%s): %s", status, payload.get('error'))
+
+def _run_job(name, job):
+    # schedule doesn't catch job errors, and an uncaught one would kill the scheduler thread
+    try:
+        job()
+    except Exception as e:
+        logger.error("Scheduled %s failed: %s", name, e)
+    finally:
+        LOG_HANDLER.flush()
+
+def _run_scheduler():
+    """Run the in-process scheduler loop forever"""
+    scheduler = schedule.Scheduler()
+    scheduler.every().day.at("11:59:50", BOOKING_TZ_NAME).do(_run_job, 'prewarm', _scheduled_prewarm)
+    scheduler.every().day.at("12:00", BOOKING_TZ_NAME).do(_run_job, 'auto-book', _scheduled_auto_book)
+    scheduler.every(SCHEDULED_REFRESH_SECONDS).seconds.do(_run_job, 'token refresh', _scheduled_refresh)
+    # Sleep until the next job is due rather than polling every second
+    while True:
+        idle = scheduler.idle_seconds
+        # Nothing else flushes this thread's records (e.g. the startup line) until a request comes in
+        LOG_HANDLER.flush()
+        if idle > 0:
+            time.sleep(idle)
+        scheduler.run_pending()
+
+if RUN_SCHEDULER_IN_PROCESS:
+    logger.info("Starting in-process scheduler")
+    threading.Thread(target=_run_scheduler, name='scheduler', daemon=True).start()
 
 # Depricated endpoint for manual booking. Not really needed anymore i wanted to use this to test the booking flow
 def scheduled_book():
     """Endpoint for scheduled booking - can be called by Railway cron or external service"""
     # Calculate booking time (48 hours from now at 1 PM)
-    booking_date = datetime.now() + timedelta(days=2)
-    date_time = booking_date.strftime('%Y-%m-%d') + 'T13:00'
-    
-    with app.test_request_context(
-        json={
-            'venues': ['DUMBO_DECK', 'NY_POOLSIDE'],
-            'date_time': date_time,
-            'party_size': 2,
-            'phone_number': '7709255248'
-        }
-    ):
-        result = auto_book()
-        
-        print(f"Scheduled booking attempt at {datetime.now()}: {result}")
-        
-        return result
+    now = datetime.now(BOOKING_TZ)
+    date_time = f"{(now.date() + timedelta(days=2)).isoformat()}T13:00"
+    
+    result = _auto_book_impl({
+        'venues': ['DUMBO_DECK', 'NY_POOLSIDE'],
+        'date_time': date_time,
+        'party_size': 2,
+        'phone_number': '7709255248'
+    })
+    
+    logger.info("Scheduled booking attempt at %s: %s", now, result)
+    
+    return result
 
 if __name__ == "__main__":
     import os
@@ -1488,6 +1488,12 @@ def schedule_info():
             {
                 "method": "python_scheduler",
                 "description": "Run a Python script with schedule library"
+            },
+            {
+                "method": "in_process",
+                "description": "Set RUN_SCHEDULER_IN_PROCESS=1 to run the daily booking and token refresh inside the web process",
+                "requirements": "Single gunicorn worker, and remove the 'worker: python cron.py' procfile entry so only one process books",
+                "enabled": RUN_SCHEDULER_IN_PROCESS
             }
         ],
         "endpoints": {
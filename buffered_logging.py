@@ -0,0 +1,38 @@
+"""
+Buffered logging shared by the web app and cron worker.
+
+Records are held in memory and written to stdout in one write() per flush instead of
+one per line. WARNING and above flush straight away; callers flush at the end of each
+request/job, and logging.shutdown() flushes whatever is left at exit.
+"""
+
+import logging
+import logging.handlers
+import os
+import sys
+
+
+class BufferedStreamHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that writes its whole buffer to a stream in a single call"""
+
+    def __init__(self, stream, capacity=100, flushLevel=logging.WARNING):
+        super().__init__(capacity, flushLevel=flushLevel)
+        self.stream = stream
+
+    def flush(self):
+        with self.lock:
+            if not self.buffer:
+                return
+            text = ''.join(self.format(record) + '\n' for record in self.buffer)
+            self.buffer.clear()
+            self.stream.write(text)
+            self.stream.flush()
+
+
+def setup_logging(name):
+    """Send all logging through one BufferedStreamHandler, returns (logger, handler)"""
+    handler = BufferedStreamHandler(sys.stdout)
+    # Records can sit in the buffer for a while, so stamp them when they're created
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), handlers=[handler])
+    return logging.getLogger(name), handler
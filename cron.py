@@ -2,7 +2,21 @@ import requests
 import schedule
 import time
 import os
-from datetime import datetime
+import sys
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from buffered_logging import setup_logging
+
+# Buffered logging: each job's output is written out in one go when the job finishes
+logger, LOG_HANDLER = setup_logging('booking-cron')
+
+# The web process runs the same jobs itself with RUN_SCHEDULER_IN_PROCESS=1 (see app.py).
+# Running both would fire two 12:00 auto-books, so stand down.
+if os.environ.get('RUN_SCHEDULER_IN_PROCESS', '').lower() in ('1', 'true', 'yes'):
+    logger.warning("RUN_SCHEDULER_IN_PROCESS is set, the web process runs the schedule. Exiting.")
+    LOG_HANDLER.flush()
+    sys.exit(0)
 
 # Get the app URL from environment or use default
 APP_URL = os.environ.get('RAILWAY_PUBLIC_DOMAIN')
@@ -12,37 +26,85 @@ else:
     # Fallback for local testing
     APP_URL = "http://127.0.0.1:5000"
 
-print(f"Cron job starting... Will use URL: {APP_URL}")
+logger.info("Cron job starting... Will use URL: %s", APP_URL)
+
+# One keep-alive session for every job so repeat calls to the app skip the TCP + TLS handshake
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+
+# Instead of polling every 5 minutes, sleep until the token is about to expire
+REFRESH_LEAD = 300          # refresh this many seconds before the access token expires
+REFRESH_RETRY = 300         # try again after this many seconds if a refresh fails
+REFRESH_SKIP_ABOVE = 900    # don't POST /refresh-token while the token has more than this left
+
+def schedule_next_refresh(delay):
+    """(Re)schedule the single refresh job to run in `delay` seconds"""
+    delay = max(30, int(delay))
+    schedule.clear('refresh')
+    schedule.every(delay).seconds.do(refresh_token_job).tag('refresh')
+    logger.info("   Next token refresh in %s min", delay // 60)
+
+def get_token_time_left():
+    """Ask the app how many seconds the current token has left, None if it's invalid or unknown"""
+    try:
+        response = SESSION.get(f"{APP_URL}/status", timeout=30)
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error("❌ Could not check token status: %s", e)
+        return None
+    
+    if response.status_code == 200 and data.get('token_valid'):
+        return data['expires_in']
+    logger.warning("Token not valid (%s)", data.get('error'))
+    return None
 
 def refresh_token_job():
-    """Test job that refreshes the token"""
+    """Refresh the token, then schedule the next refresh for just before it expires"""
     try:
-        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Running refresh token job...")
+        logger.info("Running refresh token job...")
+        
+        # The token may already have been refreshed (e.g. by /auto-book), so check before
+        # asking the app to go to the identity server
+        time_left = get_token_time_left()
+        if time_left and time_left > REFRESH_SKIP_ABOVE:
+            logger.info("Token still valid for another %s min, skipping refresh", int(time_left) // 60)
+            schedule_next_refresh(time_left - REFRESH_LEAD)
+            return
         
-        response = requests.post(
+        response = SESSION.post(
             f"{APP_URL}/refresh-token",
             timeout=30
         )
         
         if response.status_code == 200:
             data = response.json()
-            print(f"✅ Token refreshed successfully!")
-            print(f"   New token expires in: {data.get('expires_in', 'unknown')} seconds")
+            logger.info("✅ Token refreshed successfully!")
+            logger.info("   New token expires in: %s seconds", data.get('expires_in', 'unknown'))
+            if data.get('expires_in'):
+                schedule_next_refresh(data['expires_in'] - REFRESH_LEAD)
+                return
         else:
-            print(f"❌ Failed to refresh token: {response.status_code}")
-            print(f"   Response: {response.text[:200]}")
+            logger.error("❌ Failed to refresh token: %s\n   Response: %s", response.status_code, response.text[:200])
             
     except requests.exceptions.RequestException as e:
-        print(f"❌ Request error: {e}")
+        logger.error("❌ Request error: %s", e)
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        logger.error("❌ Unexpected error: %s", e)
+    
+    schedule_next_refresh(REFRESH_RETRY)
 
 def auto_book_job():
     """Main job that runs the auto-booking at 12:00 PM"""
     try:
-        print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Running auto-book job...")
+        logger.info("Running auto-book job...")
         
-        response = requests.post(
+        response = SESSION.post(
             f"{APP_URL}/auto-book",
             json={
                 "venues": ["NY_POOLSIDE", "DUMBO_DECK"],
@@ -54,34 +116,51 @@ def auto_book_job():
         
         if response.status_code == 200:
             data = response.json()
-            print(f"✅ Booking successful!")
-            print(f"   Booking ID: {data.get('booking_id', 'unknown')}")
+            logger.info("✅ Booking successful!")
+            logger.info("   Booking ID: %s", data.get('booking_id', 'unknown'))
         else:
-            print(f"❌ Booking failed: {response.status_code}")
-            print(f"   Response: {response.text[:200]}")
+            logger.error("❌ Booking failed: %s\n   Response: %s", response.status_code, response.text[:200])
             
     except requests.exceptions.RequestException as e:
-        print(f"❌ Request error: {e}")
+        logger.error("❌ Request error: %s", e)
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        logger.error("❌ Unexpected error: %s", e)
 
-# Schedule the jobs
-# Test: Refresh token every 5 minutes
-schedule.every(5).minutes.do(refresh_token_job)
+def prewarm_job():
+    """Open the connections the 12:00 booking will use a few seconds ahead of time"""
+    try:
+        # Warms this process's connection to the app, and the app's pooled connections to Soho
+        response = SESSION.post(f"{APP_URL}/prewarm", timeout=15)
+        logger.info("🔥 Prewarmed connections: %s", response.text[:200])
+    except requests.exceptions.RequestException as e:
+        logger.error("❌ Prewarm failed: %s", e)
 
-# Production: Auto-book daily at 12:00 PM EST
-schedule.every().day.at("12:00").do(auto_book_job)
+# Schedule the jobs. Times are New York time (when the slots open), not the host's clock,
+# which is UTC on Railway.
+BOOKING_TZ_NAME = "America/New_York"
+schedule.every().day.at("11:59:50", BOOKING_TZ_NAME).do(prewarm_job)
+# Production: Auto-book daily at 12:00 PM New York time
+schedule.every().day.at("12:00", BOOKING_TZ_NAME).do(auto_book_job)
 
-# For testing: Run refresh token immediately on startup
-print("Running initial token refresh...")
+# Token refresh: check how long the current token has left and sleep until it needs refreshing
+logger.info("Checking token status...")
 refresh_token_job()
 
 # Main loop
-print("\n📅 Scheduled jobs:")
-print("  - Token refresh: Every 5 minutes")
-print("  - Auto booking: Daily at 12:01 PM")
-print("\nCron job is running... Press Ctrl+C to stop\n")
+logger.info("📅 Scheduled jobs:")
+logger.info("  - Token refresh: %s min before the access token expires", REFRESH_LEAD // 60)
+logger.info("  - Connection prewarm: Daily at 11:59:50 AM (%s)", BOOKING_TZ_NAME)
+logger.info("  - Auto booking: Daily at 12:00 PM (%s)", BOOKING_TZ_NAME)
+logger.info("Cron job is running... Press Ctrl+C to stop")
 
+# Sleep until the next job is due instead of waking up every second to check
 while True:
+    idle = schedule.idle_seconds()
+    if idle is None:
+        break
+    # Write out what's buffered (startup output, the last job's records) before a sleep
+    # that can last until the next token refresh
+    LOG_HANDLER.flush()
+    if idle > 0:
+        time.sleep(idle)
     schedule.run_pending()
-    time.sleep(1)
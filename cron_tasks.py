@@ -3,12 +3,19 @@
 Simple cron tasks that can be called by Railway cron
 Usage: python cron_tasks.py refresh_token
        python cron_tasks.py auto_book
+       python cron_tasks.py both        (refresh then book in one process/connection)
+
+Add --prewarm to auto_book/both to open the connections first and hold the booking until
+--at HH:MM New York time (default 12:00), e.g. run "auto_book --prewarm" from an 11:59
+cron entry. Giving --at on its own implies --prewarm. If that time has already passed
+today the booking goes out straight away.
 """
 
-import requests
+import atexit
+import orjson
 import sys
 import os
-from datetime import datetime
+import time
 
 # Get the app URL from environment
 APP_URL = os.environ.get('RAILWAY_PUBLIC_DOMAIN')
@@ -18,49 +25,180 @@ else:
     print("ERROR: RAILWAY_PUBLIC_DOMAIN not set")
     sys.exit(1)
 
+# Endpoint URLs, built once
+_REFRESH_URL = f"{APP_URL}/refresh-token"
+_AUTO_BOOK_URL = f"{APP_URL}/auto-book"
+_PREWARM_URL = f"{APP_URL}/prewarm"
+
+# One keep-alive session for every task run by this process, so a second call to the app
+# reuses the TCP + TLS connection (requests already sends keep-alive and gzip headers).
+# HTTP/1.1 keep-alive is all this needs: the tasks run one after another, so there is
+# nothing for HTTP/2 multiplexing to overlap, and gunicorn behind it only speaks HTTP/1.1.
+# Built (and requests imported) on first use, so usage errors exit without paying for it.
+_session = None
+
+def _get_session():
+    """Return the shared session, creating it on first use"""
+    global _session
+    if _session is None:
+        import requests
+        from urllib3.util.retry import Retry
+        from http_adapter import LowLatencyAdapter, socket_options
+        
+        _session = requests.Session()
+        # Shared SSLContext, TCP_NODELAY on the small POST bodies, and keepalive probes so a
+        # prewarmed connection survives until the booking goes out
+        adapter = LowLatencyAdapter(
+            socket_options(keepidle=30),
+            pool_connections=2,
+            pool_maxsize=4,
+            # Only failed connects are retried: the request never reached the app, so that's
+            # safe even for these POSTs. Never a read or a 5xx: the app may already be booking.
+            max_retries=Retry(total=2, connect=2, read=0, backoff_factor=0.3)
+        )
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+        atexit.register(_session.close)
+    return _session
+
+# Venues in preference order. They go to the app in one request on purpose: /auto-book
+# already locks every venue concurrently and then books only the first one it got, while
+# one request per venue would race two independent bookings and could book both.
+VENUES = ["NY_POOLSIDE", "DUMBO_DECK"]
+
+# Request bodies are encoded with orjson and sent as bytes
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# (connect, read) timeouts: a dead connect fails fast and is retried, leaving the rest of
+# each task's budget for the app to do the work
+_REFRESH_TIMEOUT = (5, 25)
+_AUTO_BOOK_TIMEOUT = (5, 55)
+_PREWARM_TIMEOUT = (5, 10)
+
+# The auto-book request never changes, so its body is encoded once
+_AUTO_BOOK_BODY = orjson.dumps({
+    "venues": VENUES,
+    "party_size": 2,
+    "phone_number": "7709255248"
+})
+
+def _snippet(response, limit=100):
+    """Decode just the first `limit` bytes of a streamed body, for error messages"""
+    return response.raw.read(limit, decode_content=True).decode('utf-8', 'replace')
+
+def _log(*lines):
+    """Write one log event (its header plus outcome lines) to stdout in a single write"""
+    sys.stdout.write('\n'.join(lines) + '\n')
+    sys.stdout.flush()
+
+# Responses are streamed so error pages are never read in full just to print 100 bytes.
+# Success bodies are read completely, which hands the connection back to the pool;
+# leaving the `with` block on an error closes the half-read connection instead.
 def refresh_token():
     """Refresh the authentication token"""
-    print(f"[{datetime.now()}] Refreshing token...")
+    from datetime import datetime
+    header = f"[{datetime.now()}] Refreshing token..."
     try:
-        response = requests.post(f"{APP_URL}/refresh-token", timeout=30)
-        if response.status_code == 200:
-            print("✅ Token refreshed successfully")
-        else:
-            print(f"❌ Failed: {response.status_code} - {response.text[:100]}")
+        with _get_session().post(_REFRESH_URL, timeout=_REFRESH_TIMEOUT, stream=True) as response:
+            if response.status_code == 200:
+                expires_in = orjson.loads(response.content).get('expires_in')
+                _log(header, f"✅ Token refreshed successfully (expires in {expires_in} s)")
+            else:
+                _log(header, f"❌ Failed: {response.status_code} - {_snippet(response)}")
     except Exception as e:
-        print(f"❌ Error: {e}")
+        _log(header, f"❌ Error: {e}")
 
 def auto_book():
     """Run the auto-booking process"""
-    print(f"[{datetime.now()}] Running auto-book...")
+    from datetime import datetime
+    header = f"[{datetime.now()}] Running auto-book..."
     try:
-        response = requests.post(
-            f"{APP_URL}/auto-book",
-            json={
-                "venues": ["NY_POOLSIDE", "DUMBO_DECK"],
-                "party_size": 2,
-                "phone_number": "7709255248"
-            },
-            timeout=60
-        )
-        if response.status_code == 200:
-            print("✅ Booking successful")
-            print(response.json())
-        else:
-            print(f"❌ Failed: {response.status_code} - {response.text[:100]}")
+        with _get_session().post(
+            _AUTO_BOOK_URL,
+            data=_AUTO_BOOK_BODY,
+            headers=_JSON_HEADERS,
+            timeout=_AUTO_BOOK_TIMEOUT,
+            stream=True
+        ) as response:
+            if response.status_code == 200:
+                # The app's JSON is logged as-is, no parse/re-encode round trip
+                _log(header, "✅ Booking successful", response.content.decode('utf-8', 'replace'))
+            else:
+                _log(header, f"❌ Failed: {response.status_code} - {_snippet(response)}")
     except Exception as e:
-        print(f"❌ Error: {e}")
+        _log(header, f"❌ Error: {e}")
+
+PREWARM_LEAD = 10  # seconds before the booking time to open the connections
+BOOK_AT = "12:00"  # default --at: when the slots open, New York time
+BOOKING_TZ = "America/New_York"
+
+def prewarm():
+    """Open this process's connection to the app, and the app's to Soho, ahead of booking"""
+    from datetime import datetime
+    header = f"[{datetime.now()}] Prewarming connections..."
+    try:
+        response = _get_session().post(_PREWARM_URL, timeout=_PREWARM_TIMEOUT)
+        _log(header, f"🔥 Prewarmed: {response.status_code}")
+    except Exception as e:
+        _log(header, f"❌ Prewarm failed: {e}")
+
+def _booking_target(at):
+    """Epoch time of today's HH:MM in BOOKING_TZ"""
+    from datetime import datetime
+    import pytz
+    tz = pytz.timezone(BOOKING_TZ)
+    hour, minute = map(int, at.split(':'))
+    now = datetime.now(tz)
+    target = tz.localize(now.replace(tzinfo=None, hour=hour, minute=minute, second=0, microsecond=0))
+    return target.timestamp()
+
+def prewarm_and_wait(at=BOOK_AT):
+    """Prewarm shortly before `at` (HH:MM New York time), then sleep until it comes
+
+    The target is explicit rather than "the next minute" so a container that starts a
+    little late (e.g. at 12:00:02) books right away instead of waiting for 12:01.
+    """
+    target = _booking_target(at)
+    if target - time.time() > PREWARM_LEAD:
+        time.sleep(target - time.time() - PREWARM_LEAD)
+    prewarm()
+    time.sleep(max(0, target - time.time()))
 
 if __name__ == "__main__":
+    usage = "Usage: python cron_tasks.py [refresh_token|auto_book|both] [--prewarm] [--at HH:MM]"
     if len(sys.argv) < 2:
-        print("Usage: python cron_tasks.py [refresh_token|auto_book]")
+        print(usage)
         sys.exit(1)
     
     task = sys.argv[1]
+    options = sys.argv[2:]
+    prewarm_first = '--prewarm' in options
+    book_at = BOOK_AT
+    if '--at' in options:
+        try:
+            book_at = options[options.index('--at') + 1]
+            time.strptime(book_at, '%H:%M')
+        except (IndexError, ValueError):
+            print(usage)
+            sys.exit(1)
+        # A booking time only means something if we wait for it
+        prewarm_first = True
+    
+    if prewarm_first and task == "refresh_token":
+        print(usage)
+        sys.exit(1)
     
     if task == "refresh_token":
         refresh_token()
     elif task == "auto_book":
+        if prewarm_first:
+            prewarm_and_wait(book_at)
+        auto_book()
+    elif task == "both":
+        # One interpreter start, and the booking reuses the refresh's keep-alive connection
+        refresh_token()
+        if prewarm_first:
+            prewarm_and_wait(book_at)
         auto_book()
     else:
         print(f"Unknown task: {task}")
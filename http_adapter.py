@@ -0,0 +1,56 @@
+"""
+Connection setup shared by the web app and the cron tasks.
+
+Every pool mounted with LowLatencyAdapter reuses one SSLContext, loaded once with the CA
+bundle requests verifies against, and opens sockets with TCP_NODELAY and keepalive probes.
+"""
+
+import os
+import socket
+import ssl
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Same bundle requests would pick: REQUESTS_CA_BUNDLE / CURL_CA_BUNDLE, else certifi
+CA_BUNDLE = os.environ.get('REQUESTS_CA_BUNDLE') or os.environ.get('CURL_CA_BUNDLE') or requests.certs.where()
+SSL_CONTEXT = ssl.create_default_context(cafile=CA_BUNDLE)
+
+
+def socket_options(keepidle):
+    """TCP_NODELAY plus keepalive probes after `keepidle` idle seconds
+
+    Passing socket_options replaces urllib3's default, so TCP_NODELAY (no Nagle delay on
+    small POST bodies) is listed explicitly. Keepalive stops idle pooled connections, like
+    prewarmed ones, from being dropped by NAT/load balancers.
+    """
+    options = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    if hasattr(socket, 'TCP_KEEPIDLE'):  # Linux; not available on macOS
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keepidle))
+    return options
+
+
+class LowLatencyAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools all reuse SSL_CONTEXT and the given socket options"""
+
+    __attrs__ = HTTPAdapter.__attrs__ + ['socket_options']
+
+    def __init__(self, socket_options, **kwargs):
+        # Set before HTTPAdapter.__init__, which builds the pool manager
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = SSL_CONTEXT
+        kwargs['socket_options'] = self.socket_options
+        return super().init_poolmanager(*args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        if verify is True or verify == CA_BUNDLE:
+            # SSL_CONTEXT already holds this bundle. Left set, ca_certs makes urllib3 load it
+            # into the shared context again for every new connection.
+            conn.ca_certs = None